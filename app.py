@@ -1,26 +1,65 @@
 import os
-import json
 import uuid
 import random
+import heapq
 import datetime
 import threading
 import csv
 import io
+import time
+import hmac
+import functools
+from collections import namedtuple
+import orjson
 from flask import Flask, render_template, request, redirect, url_for, session, jsonify, abort, Response
+from flask.json.provider import JSONProvider
+from markupsafe import escape
 from werkzeug.security import generate_password_hash, check_password_hash
 
+try:
+    import redis
+except ImportError:  # optional: only needed when REDIS_URL is set
+    redis = None
+
+
+class OrjsonProvider(JSONProvider):
+    # jsonify(), request.get_json() and the session cookie all go through orjson
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__, static_folder='static', template_folder='templates')
+app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get("SECRET_KEY", "dev_secret_key_change_me")
+ADMIN_PW = os.environ.get("ADMIN_PW")
+if not ADMIN_PW:
+    # Only the debug server (FLASK_DEBUG=1) may fall back to a known password
+    if not app.debug:
+        raise RuntimeError("ADMIN_PW environment variable must be set")
+    ADMIN_PW = "admin123"
+    app.logger.warning("ADMIN_PW not set; using the development admin password 'admin123'")
 
 # Always read/write JSON files from the app's directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 USERS_FILE = os.path.join(BASE_DIR, "users.json")
 QUESTIONS_FILE = os.path.join(BASE_DIR, "questions.json")
-SCORES_FILE = os.path.join(BASE_DIR, "scores.json")
+SCORES_FILE = os.path.join(BASE_DIR, "scores.jsonl")  # one JSON record per line, append-only
+LEGACY_SCORES_FILE = os.path.join(BASE_DIR, "scores.json")  # imported once if scores.jsonl is missing
 
 # For safe writes
 DATA_LOCK = threading.Lock()
 
+# Parsed JSON files keyed by path:
+# path -> ((st_mtime_ns, st_size), data, by_id, by_subject)
+# by_id/by_subject are only built for the questions file (None otherwise)
+_JSON_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+QuestionIndex = namedtuple("QuestionIndex", ["all", "by_id", "by_subject"])
+
 SUBJECTS = ["Physics", "Chemistry", "Botany", "Zoology", "Mental Agility Test"]
 SUBJECT_TARGETS = {
     "Physics": 50,
@@ -29,35 +68,193 @@ SUBJECT_TARGETS = {
     "Zoology": 40,
     "Mental Agility Test": 20
 }
-
-# Active quizzes in memory
+_SUBJECT_BY_LOWER = {s.lower(): s for s in SUBJECTS}
+
+# Shared RNG for picking quiz questions
+_RNG = random.Random()
+
+# Active quizzes live in Redis when REDIS_URL is set, so every worker sees them.
+# Otherwise (local dev) they're kept in this process: quiz_id -> (expires_at, state)
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL and redis is None:
+    # Falling back to per-process state here would silently lose quizzes across workers
+    raise RuntimeError("REDIS_URL is set but the redis package is not installed")
+redis_client = redis.Redis.from_url(REDIS_URL) if REDIS_URL else None
+QUIZ_GRACE_SECONDS = 300  # kept this long past the timer for late submits
 active_quizzes = {}
+_QUIZ_LOCK = threading.Lock()
+
+# Leaderboard: min-heap of the best LEADERBOARD_SIZE scores, fed from scores.jsonl.
+# Entries are (percentage, score, -line_no, record) so ties keep the earlier record.
+LEADERBOARD_SIZE = 10
+_TOP_SCORES = []
+_SCORES_READ = {"offset": 0, "lines": 0, "version": 0}  # version bumps when the top-N changes
+_SCORES_LOCK = threading.Lock()
+
+
+def dump_json(data, compact=True):
+    # Data files are machine-read, so compact; pretty output is for admin exports
+    return orjson.dumps(data) if compact else orjson.dumps(data, option=orjson.OPT_INDENT_2)
 
 
 def ensure_file(path, default):
     # Create file with default content only if it doesn't exist
     if not os.path.exists(path):
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(default, f, indent=2, ensure_ascii=False)
+        with open(path, "wb") as f:
+            f.write(dump_json(default))
 
 
 def load_json(path, default=None):
     ensure_file(path, default if default is not None else [])
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "rb") as f:
         try:
-            return json.load(f)
-        except json.JSONDecodeError as e:
+            return orjson.loads(f.read())
+        except orjson.JSONDecodeError as e:
             # Surface problem clearly without wiping silently
             raise RuntimeError(f"Invalid JSON in {path}: {e}")
 
 
-def save_json(path, data):
-    # Atomic write to avoid corruption
+def _stat_key(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def index_questions(data):
+    by_id = {}
+    by_subject = {s: [] for s in SUBJECTS}
+    for q in data:
+        qid = q.get("id")
+        if qid is not None:
+            by_id[qid] = q
+        by_subject.setdefault(q.get("subject"), []).append(q)
+    return by_id, by_subject
+
+
+def _cache_entry(path, key, data):
+    if path == QUESTIONS_FILE:
+        return (key, data) + index_questions(data)
+    return (key, data, None, None)
+
+
+def _load_cache_entry(path, default):
+    ensure_file(path, default if default is not None else [])
+    with _CACHE_LOCK:
+        key = _stat_key(path)
+        entry = _JSON_CACHE.get(path)
+        if entry is None or entry[0] != key:
+            entry = _JSON_CACHE[path] = _cache_entry(path, key, load_json(path, default))
+        return entry
+
+
+def load_json_cached(path, default=None):
+    # Same as load_json, but only re-reads the file when it changed on disk.
+    # The returned object is shared between requests: copy before mutating.
+    return _load_cache_entry(path, default)[1]
+
+
+def questions_index():
+    # QuestionIndex(all questions, {id: question}, {subject: [questions]}) from the cache
+    return QuestionIndex._make(_load_cache_entry(QUESTIONS_FILE, [])[1:])
+
+
+def fsync_dir(path):
+    # Make a rename inside this directory durable. Not supported on Windows.
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    dfd = os.open(os.path.dirname(path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(dfd)
+    finally:
+        os.close(dfd)
+
+
+def save_json(path, data, compact=True):
+    # Atomic write to avoid corruption. Encoded up front, so the file gets a single write().
     tmp = f"{path}.tmp"
+    payload = dump_json(data, compact)
     with DATA_LOCK:
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(tmp, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
         os.replace(tmp, path)
+        fsync_dir(path)
+        # Keep cached files in step with what we just wrote (no re-parse needed);
+        # files nobody reads through the cache (e.g. users) aren't added to it
+        with _CACHE_LOCK:
+            if path in _JSON_CACHE:
+                _JSON_CACHE[path] = _cache_entry(path, _stat_key(path), data)
+
+
+def append_score(record):
+    # One write() in append mode; no need to load or rewrite the history
+    line = orjson.dumps(record) + b"\n"
+    with DATA_LOCK:
+        with open(SCORES_FILE, "ab") as f:
+            f.write(line)
+
+
+def top_scores():
+    # Pick up any lines appended since the last call (by this or another worker).
+    # Returns (version, best records first); version changes whenever the list does.
+    with _SCORES_LOCK:
+        try:
+            with open(SCORES_FILE, "rb") as f:
+                if os.fstat(f.fileno()).st_size < _SCORES_READ["offset"]:
+                    # File was truncated or replaced: rebuild from the start
+                    _TOP_SCORES.clear()
+                    _SCORES_READ["offset"] = _SCORES_READ["lines"] = 0
+                    _SCORES_READ["version"] += 1
+                f.seek(_SCORES_READ["offset"])
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # partially written record, read it next time
+                    _SCORES_READ["offset"] += len(line)
+                    if not line.strip():
+                        continue
+                    _SCORES_READ["lines"] += 1
+                    try:
+                        rec = orjson.loads(line)
+                    except orjson.JSONDecodeError as e:
+                        # e.g. a record torn by a crash mid-append; skip it for good
+                        app.logger.warning(f"Skipping bad line {_SCORES_READ['lines']} in {SCORES_FILE}: {e}")
+                        continue
+                    if not isinstance(rec, dict):
+                        continue
+                    item = (rec.get("percentage", 0), rec.get("score", 0), -_SCORES_READ["lines"], rec)
+                    if len(_TOP_SCORES) < LEADERBOARD_SIZE:
+                        heapq.heappush(_TOP_SCORES, item)
+                    elif heapq.heappushpop(_TOP_SCORES, item) is item:
+                        continue  # didn't make the top N
+                    _SCORES_READ["version"] += 1
+        except FileNotFoundError:
+            pass
+        return _SCORES_READ["version"], [item[3] for item in sorted(_TOP_SCORES, reverse=True)]
+
+
+def store_quiz(quiz_id, state):
+    ttl = state["duration"] + QUIZ_GRACE_SECONDS
+    if redis_client is not None:
+        redis_client.setex(f"quiz:{quiz_id}", ttl, orjson.dumps(state))
+        return
+    now = time.time()
+    with _QUIZ_LOCK:
+        # Drop abandoned quizzes so memory doesn't grow forever
+        for qid in [k for k, (expires, _) in active_quizzes.items() if expires < now]:
+            del active_quizzes[qid]
+        active_quizzes[quiz_id] = (now + ttl, state)
+
+
+def get_quiz(quiz_id, remove=False):
+    if redis_client is not None:
+        key = f"quiz:{quiz_id}"
+        raw = redis_client.getdel(key) if remove else redis_client.get(key)
+        return orjson.loads(raw) if raw else None
+    with _QUIZ_LOCK:
+        entry = active_quizzes.pop(quiz_id, None) if remove else active_quizzes.get(quiz_id)
+    if not entry or entry[0] < time.time():
+        return None
+    return entry[1]
 
 
 def require_login():
@@ -74,25 +271,38 @@ def compute_remark(percentage):
 
 
 def get_questions(subject=None):
-    data = load_json(QUESTIONS_FILE, [])
-    if subject is None or subject in ("All", "full"):
-        return data
-    return [q for q in data if q.get("subject") == subject]
+    # Returns live lists from the cache: do not mutate. Writes go through save_json,
+    # which rebuilds the index.
+    idx = questions_index()
+    return idx.all if subject in (None, "All", "full") else idx.by_subject.get(subject, [])
 
 
 def next_question_id():
-    data = load_json(QUESTIONS_FILE, [])
-    return (max((q.get("id", 0) for q in data), default=0) + 1) if data else 1
+    by_id = questions_index().by_id
+    return max(by_id, default=0) + 1
+
+
+def pick_random(pool, k):
+    # When taking most of the pool, one shuffle of a copy is cheaper than sample()
+    if k >= len(pool) * 0.8:
+        picked = list(pool)
+        _RNG.shuffle(picked)
+        return picked[:k]
+    return _RNG.sample(pool, k)
 
 
 def normalize_text(s):
     return " ".join((s or "").split()).strip()
 
 
+@functools.lru_cache(maxsize=65536)
+def _norm(s):
+    # Lowercased normalize_text, memoized for the CSV dedup/answer checks
+    return normalize_text(s).lower()
+
+
 def canonical_subject(subj):
-    s = (subj or "").strip().lower()
-    mapping = {x.lower(): x for x in SUBJECTS}
-    return mapping.get(s)
+    return _SUBJECT_BY_LOWER.get((subj or "").strip().lower())
 
 
 @app.route("/")
@@ -164,23 +374,21 @@ def quiz(subject):
     if subj_key != "full" and subj_key not in SUBJECTS:
         abort(404)
 
-    # Load questions
-    all_questions = get_questions(None if subj_key == "full" else subj_key)
-
+    # Pick questions from the cached per-subject index
     if subj_key == "full":
+        by_subject = questions_index().by_subject
         combined = []
-        by_subject = {s: [q for q in all_questions if q.get("subject") == s] for s in SUBJECTS}
         for s in SUBJECTS:
-            avail = by_subject.get(s, [])
+            avail = by_subject.get(s, ())
             if not avail:
                 continue
-            target = min(SUBJECT_TARGETS.get(s, len(avail)), len(avail))
-            combined.extend(random.sample(avail, target) if len(avail) >= target else avail)
-        random.shuffle(combined)
+            target = min(SUBJECT_TARGETS[s], len(avail))
+            combined.extend(pick_random(avail, target))
+        _RNG.shuffle(combined)
         selected = combined
     else:
-        target = min(SUBJECT_TARGETS.get(subj_key, len(all_questions)), len(all_questions))
-        selected = random.sample(all_questions, target) if target and len(all_questions) > target else all_questions
+        avail = get_questions(subj_key)
+        selected = pick_random(avail, min(SUBJECT_TARGETS[subj_key], len(avail)))
 
     total_questions = len(selected)
     if total_questions == 0:
@@ -193,13 +401,21 @@ def quiz(subject):
 
     timer_seconds = total_questions * 60
     quiz_id = str(uuid.uuid4())
-    active_quizzes[quiz_id] = {
+    # The /api/quiz response never changes for a quiz, so encode it once here
+    payload = orjson.dumps({"questions": [{
+        "id": q["id"],
+        "subject": q.get("subject"),
+        "question": q.get("question"),
+        "options": q.get("options", [])
+    } for q in selected]})
+    store_quiz(quiz_id, {
         "username": username,
         "subject": subject_display,
         "question_ids": [q["id"] for q in selected],
         "start_time": datetime.datetime.utcnow().isoformat(),
-        "duration": timer_seconds
-    }
+        "duration": timer_seconds,
+        "payload": payload.decode("utf-8")
+    })
 
     return render_template("quiz.html",
                             username=username,
@@ -213,24 +429,10 @@ def quiz(subject):
 def api_quiz(quiz_id):
     if not require_login():
         return jsonify({"error": "Not authenticated"}), 401
-    quiz = active_quizzes.get(quiz_id)
+    quiz = get_quiz(quiz_id)
     if not quiz:
         return jsonify({"error": "Quiz not found"}), 404
-    all_questions = load_json(QUESTIONS_FILE, [])
-    id_set = set(quiz["question_ids"])
-    order_map = {qid: idx for idx, qid in enumerate(quiz["question_ids"])}
-    sanitized = []
-    for q in all_questions:
-        qid = q.get("id")
-        if qid in id_set:
-            sanitized.append({
-                "id": qid,
-                "subject": q.get("subject"),
-                "question": q.get("question"),
-                "options": q.get("options", [])
-            })
-    sanitized.sort(key=lambda x: order_map.get(x["id"], 10**9))
-    return jsonify({"questions": sanitized})
+    return Response(quiz["payload"], mimetype="application/json")
 
 
 @app.route("/submit", methods=["POST"])
@@ -241,12 +443,11 @@ def submit_quiz():
     quiz_id = payload.get("quiz_id")
     answers = payload.get("answers", {})  # {str(question_id): option_text}
 
-    quiz = active_quizzes.pop(quiz_id, None)
+    quiz = get_quiz(quiz_id, remove=True)
     if not quiz:
         return jsonify({"error": "Quiz not found or expired"}), 404
 
-    all_questions = load_json(QUESTIONS_FILE, [])
-    qmap = {q["id"]: q for q in all_questions}
+    qmap = questions_index().by_id
 
     subject = quiz["subject"]
     username = session.get("username")
@@ -277,8 +478,7 @@ def submit_quiz():
     percentage = round((correct_count / total) * 100, 2) if total else 0.0
     remark = compute_remark(percentage)
 
-    scores = load_json(SCORES_FILE, [])
-    scores.append({
+    append_score({
         "username": username,
         "subject": subject,
         "score": correct_count,
@@ -286,8 +486,6 @@ def submit_quiz():
         "percentage": percentage,
         "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     })
-    scores_sorted = sorted(scores, key=lambda s: (s.get("percentage", 0), s.get("score", 0)), reverse=True)
-    save_json(SCORES_FILE, scores_sorted)
 
     session["last_result"] = {
         "username": username,
@@ -311,27 +509,45 @@ def result():
     return render_template("result.html", **res)
 
 
+# Rendered leaderboard for the current top-scores version, with a slot for the username
+_LEADERBOARD_PAGE = (None, "")
+_USERNAME_SLOT = "\x00username\x00"
+
+
 @app.route("/leaderboard")
 def leaderboard():
     if not require_login():
         return redirect(url_for("login"))
-    scores = load_json(SCORES_FILE, [])
-    top10 = scores[:10]
-    return render_template("leaderboard.html", scores=top10, username=session.get("username"))
+    global _LEADERBOARD_PAGE
+    version, top10 = top_scores()
+    cached_version, html = _LEADERBOARD_PAGE
+    if cached_version != version or app.debug:
+        html = render_template("leaderboard.html", scores=top10, username=_USERNAME_SLOT)
+        _LEADERBOARD_PAGE = (version, html)
+    # The nav greeting comes before the table, so only the first slot is the user's
+    return html.replace(_USERNAME_SLOT, str(escape(session.get("username"))), 1)
 
 
 # ---------------- Admin + CSV ----------------
 
+# The logged-in admin page has no per-request content, so render it once
+_ADMIN_PAGE = None
+
+
 @app.route("/admin", methods=["GET", "POST"])
 def admin():
+    global _ADMIN_PAGE
     if request.method == "POST":
         password = request.form.get("password", "")
-        if password == "admin123":
+        if hmac.compare_digest(password.encode("utf-8"), ADMIN_PW.encode("utf-8")):
             session["admin_auth"] = True
         else:
             return render_template("admin.html", admin_authed=False, error="Invalid admin password.")
-    authed = session.get("admin_auth", False)
-    return render_template("admin.html", admin_authed=authed)
+    if not session.get("admin_auth", False):
+        return render_template("admin.html", admin_authed=False)
+    if _ADMIN_PAGE is None or app.debug:
+        _ADMIN_PAGE = render_template("admin.html", admin_authed=True)
+    return _ADMIN_PAGE
 
 
 def require_admin():
@@ -365,7 +581,7 @@ def admin_add_question():
     if answer not in options:
         return jsonify({"error": "Answer must be one of the options"}), 400
 
-    data = load_json(QUESTIONS_FILE, [])
+    data = list(load_json_cached(QUESTIONS_FILE, []))
     new_item = {
         "id": next_question_id(),
         "subject": subject,
@@ -390,39 +606,41 @@ def admin_update_question():
     except (TypeError, ValueError):
         return jsonify({"error": "Missing or invalid id"}), 400
 
-    data = load_json(QUESTIONS_FILE, [])
-    for q in data:
-        if q.get("id") == qid:
-            new_subject = payload.get("subject")
-            new_question = payload.get("question")
-            new_options = payload.get("options")
-            new_answer = payload.get("answer")
-            new_difficulty = payload.get("difficulty")
-            new_explanation = payload.get("explanation")
-
-            if new_subject:
-                if new_subject not in SUBJECTS:
-                    return jsonify({"error": "Invalid subject"}), 400
-                q["subject"] = new_subject
-            if new_question:
-                q["question"] = new_question
-            if new_options is not None:
-                if not isinstance(new_options, list) or len(new_options) != 4:
-                    return jsonify({"error": "Options must have 4 items"}), 400
-                q["options"] = new_options
-            if new_answer:
-                if new_answer not in q.get("options", []):
-                    return jsonify({"error": "Answer must be one of options"}), 400
-                q["answer"] = new_answer
-            if new_difficulty:
-                q["difficulty"] = new_difficulty
-            if new_explanation is not None:
-                q["explanation"] = new_explanation
-
-            save_json(QUESTIONS_FILE, data)
-            return jsonify({"ok": True})
-
-    return jsonify({"error": "Question not found"}), 404
+    data, by_id, _ = questions_index()
+    current = by_id.get(qid)
+    if current is None:
+        return jsonify({"error": "Question not found"}), 404
+
+    # Edit a copy so the cached list stays untouched until saved
+    q = dict(current)
+    new_subject = payload.get("subject")
+    new_question = payload.get("question")
+    new_options = payload.get("options")
+    new_answer = payload.get("answer")
+    new_difficulty = payload.get("difficulty")
+    new_explanation = payload.get("explanation")
+
+    if new_subject:
+        if new_subject not in SUBJECTS:
+            return jsonify({"error": "Invalid subject"}), 400
+        q["subject"] = new_subject
+    if new_question:
+        q["question"] = new_question
+    if new_options is not None:
+        if not isinstance(new_options, list) or len(new_options) != 4:
+            return jsonify({"error": "Options must have 4 items"}), 400
+        q["options"] = new_options
+    if new_answer:
+        if new_answer not in q.get("options", []):
+            return jsonify({"error": "Answer must be one of options"}), 400
+        q["answer"] = new_answer
+    if new_difficulty:
+        q["difficulty"] = new_difficulty
+    if new_explanation is not None:
+        q["explanation"] = new_explanation
+
+    save_json(QUESTIONS_FILE, [q if item is current else item for item in data])
+    return jsonify({"ok": True})
 
 
 @app.route("/admin/delete_question", methods=["POST"])
@@ -435,11 +653,10 @@ def admin_delete_question():
     except (TypeError, ValueError):
         return jsonify({"error": "Missing or invalid id"}), 400
 
-    data = load_json(QUESTIONS_FILE, [])
-    new_data = [q for q in data if q.get("id") != qid]
-    if len(new_data) == len(data):
+    data, by_id, _ = questions_index()
+    if qid not in by_id:
         return jsonify({"error": "Question not found"}), 404
-    save_json(QUESTIONS_FILE, new_data)
+    save_json(QUESTIONS_FILE, [q for q in data if q.get("id") != qid])
     return jsonify({"ok": True})
 
 
@@ -456,6 +673,14 @@ def admin_csv_template():
                     headers={"Content-Disposition": "attachment; filename=questions_template.csv"})
 
 
+@app.route("/admin/export_questions")
+def admin_export_questions():
+    require_admin()
+    data = load_json_cached(QUESTIONS_FILE, [])
+    return Response(dump_json(data, compact=False), mimetype="application/json",
+                    headers={"Content-Disposition": "attachment; filename=questions.json"})
+
+
 @app.route("/admin/upload_csv", methods=["POST"])
 def admin_upload_csv():
     require_admin()
@@ -465,28 +690,33 @@ def admin_upload_csv():
     if not file.filename.lower().endswith(".csv"):
         return jsonify({"error": "Please upload a .csv file"}), 400
 
-    # Read CSV (handle BOM)
-    try:
-        stream = io.TextIOWrapper(file.stream, encoding="utf-8-sig")
-    except Exception:
-        content = file.read()
-        stream = io.StringIO(content.decode("utf-8-sig", errors="ignore"))
+    # Stream rows straight from the upload (handles BOM; no full-file decode)
+    # Before Python 3.11 SpooledTemporaryFile has no readable(), which TextIOWrapper
+    # needs; wrap the file it spools into instead
+    raw = file.stream if hasattr(file.stream, "readable") else getattr(file.stream, "_file", file.stream)
+    stream = io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
 
     reader = csv.DictReader(stream)
     if not reader.fieldnames:
         return jsonify({"error": "CSV has no header row"}), 400
 
-    data = load_json(QUESTIONS_FILE, [])
-    existing_keys = set((q.get("subject","").lower(), normalize_text(q.get("question","")).lower()) for q in data)
+    data = list(load_json_cached(QUESTIONS_FILE, []))
+    # Built once per upload; rows added from this file are tracked in new_keys
+    existing_keys = frozenset((q.get("subject","").lower(), _norm(q.get("question") or "")) for q in data)
+    new_keys = set()
+
+    # Normalized header name -> column name as written in the file
+    hdr = {}
+    for col in reader.fieldnames:
+        hdr.setdefault((col or "").strip().lower(), col)
 
     def pick(row, keys):
-        # row keys are already case-insensitive with DictReader; still normalize
         for k in keys:
-            for col in row.keys():
-                if (col or "").strip().lower() == k:
-                    v = row.get(col)
-                    if v is not None and str(v).strip() != "":
-                        return str(v).strip()
+            col = hdr.get(k)
+            if col is not None:
+                v = row.get(col)
+                if v and v.strip():
+                    return v.strip()
         return ""
 
     added = 0
@@ -495,9 +725,8 @@ def admin_upload_csv():
     next_id = next_question_id()
 
     line_idx = 1
-    for raw_row in reader:
+    for row in reader:
         line_idx += 1
-        row = { (k or "").strip().lower(): (v or "").strip() for k, v in raw_row.items() }
 
         subj_raw = pick(row, ["subject"])
         subj = canonical_subject(subj_raw)
@@ -527,15 +756,16 @@ def admin_upload_csv():
         if ans_index is not None:
             answer = options[ans_index]
         else:
-            matches = [o for o in options if normalize_text(o).lower() == normalize_text(answer_raw).lower()]
+            answer_norm = _norm(answer_raw)
+            matches = [o for o in options if _norm(o) == answer_norm]
             if not matches:
                 errors.append(f"Row {line_idx}: Answer '{answer_raw}' does not match any option")
                 skipped += 1
                 continue
             answer = matches[0]
 
-        key = (subj.lower(), normalize_text(question).lower())
-        if key in existing_keys:
+        key = (subj.lower(), _norm(question))
+        if key in existing_keys or key in new_keys:
             skipped += 1
             continue
 
@@ -549,7 +779,7 @@ def admin_upload_csv():
             "explanation": explanation
         }
         data.append(new_item)
-        existing_keys.add(key)
+        new_keys.add(key)
         next_id += 1
         added += 1
 
@@ -568,7 +798,28 @@ def admin_upload_csv():
 # This MUST be outside the if __name__ == "__main__": block for Vercel.
 ensure_file(USERS_FILE, [])
 ensure_file(QUESTIONS_FILE, [])
-ensure_file(SCORES_FILE, [])
+if not os.path.exists(SCORES_FILE):
+    # Carry over history from the old scores.json format, if this host has one
+    legacy = []
+    if os.path.exists(LEGACY_SCORES_FILE):
+        try:
+            legacy = load_json(LEGACY_SCORES_FILE)
+        except RuntimeError as e:
+            # Start a fresh journal rather than refusing to boot; scores.json is left as is
+            app.logger.warning(f"Not importing old scores: {e}")
+    with open(f"{SCORES_FILE}.tmp", "wb") as f:
+        f.write(b"".join(orjson.dumps(rec) + b"\n" for rec in legacy))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{SCORES_FILE}.tmp", SCORES_FILE)
+top_scores()  # build the leaderboard heap once on cold start
+
+# Parse questions (and build their indexes) now so the first request doesn't pay for it
+try:
+    questions_index()
+except RuntimeError as e:
+    # Don't take the whole app down; quiz routes will report it when hit
+    app.logger.warning(str(e))
 
 # 2. Vercel Entry Point: Expose the Flask application object
 # Vercel's WSGI handler looks for 'application' to execute the app.
@@ -582,4 +833,9 @@ if __name__ == "__main__":
     print(f"QUESTIONS_FILE: {QUESTIONS_FILE}")
     print(f"SCORES_FILE: {SCORES_FILE}")
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+    # Werkzeug's debug server is slow (reloader, debugger); use it only on request
+    if os.environ.get("FLASK_DEBUG") == "1":
+        app.run(host="0.0.0.0", port=port, debug=True)
+    else:
+        from waitress import serve
+        serve(app, host="0.0.0.0", port=port, threads=8)
\ No newline at end of file